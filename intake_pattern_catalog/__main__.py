@@ -0,0 +1,80 @@
+"""
+Command-line tools for pattern catalogs, e.g.
+
+    python -m intake_pattern_catalog index catalog.yaml stuff --output-dir indexes
+
+lists the `stuff` source of catalog.yaml and writes its matches to
+indexes/stuff.index.json, which can be passed as the `index` argument of the
+source so that it starts without listing.
+"""
+import argparse
+import os
+import time
+from typing import List, Optional
+
+import intake
+
+from .catalog import PatternCatalog
+
+
+def _pattern_cat_sources(catalog, names: List[str]) -> List[str]:
+    pattern_cats = [
+        name
+        for name, entry in catalog._entries.items()
+        if PatternCatalog.name in entry.describe()["plugin"]
+    ]
+    if not names:
+        return pattern_cats
+    for name in names:
+        if name not in pattern_cats:
+            raise SystemExit(f"{name} is not a pattern_cat source in the catalog")
+    return names
+
+
+def index(
+    catalog_path: str, sources: List[str], output_dir: str, index_path: Optional[str]
+) -> None:
+    catalog = intake.open_catalog(catalog_path)
+    names = _pattern_cat_sources(catalog, sources)
+    if index_path is not None and len(names) != 1:
+        raise SystemExit("--output can only be used when indexing a single source")
+    for name in names:
+        # Don't list on instantiation (or load an existing index), write_index does
+        source = catalog._entries[name].get(listable=False, index=None)
+        path = index_path or os.path.join(output_dir, f"{name}.index.json")
+        start = time.perf_counter()
+        listing = source.write_index(path)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(listing.paths)} matches in {elapsed:.2f}s -> {path}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m intake_pattern_catalog")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index_parser = commands.add_parser(
+        "index",
+        help="List pattern_cat sources and write their matches to index files",
+    )
+    index_parser.add_argument("catalog", help="Path to the intake catalog file")
+    index_parser.add_argument(
+        "sources",
+        nargs="*",
+        help="Names of the pattern_cat sources to index (default: all of them)",
+    )
+    index_parser.add_argument(
+        "--output-dir",
+        default=".",
+        help="Directory to write <source>.index.json files to (can be remote)",
+    )
+    index_parser.add_argument(
+        "-o", "--output", help="Path to write the index to, for a single source"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "index":
+        index(args.catalog, args.sources, args.output_dir, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,24 @@
+import asyncio
+import re
+import time
 import warnings
-from typing import Any, Callable, Dict, List, Mapping, Optional
-
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Union,
+)
+from weakref import WeakKeyDictionary, finalize
+
+from fsspec.asyn import AsyncFileSystem
 from fsspec.core import strip_protocol, url_to_fs
 from intake.catalog import Catalog, local
 from intake.catalog.utils import reload_on_change
@@ -8,6 +26,17 @@ from intake.source.base import DataSource
 from intake.source.derived import GenericTransform, first
 from intake.source.utils import path_to_glob, reverse_formats
 
+from .index import read_index, write_index
+from .listing import (
+    ListingSnapshot,
+    awalk_pattern,
+    file_info,
+    listing_registry,
+    walk_pattern,
+)
+from .patterns import fields, may_contain_slash, pattern_regex, pattern_to_glob
+from .prefetch import EntryPrefetcher
+
 
 class PatternCatalog(Catalog):
     """Catalog of entries as described by a path pattern (e.g. folder/{a}/{b}.csv)"""
@@ -15,6 +44,7 @@ class PatternCatalog(Catalog):
     container = "catalog"
     partition_access = None
     name = "pattern_cat"
+    _entries: Dict[str, local.LocalCatalogEntry]
 
     def __init__(
         self,
@@ -24,6 +54,9 @@ class PatternCatalog(Catalog):
         ttl: int = 60,
         recursive_glob: bool = False,
         listable: bool = True,
+        shared_listing: bool = True,
+        index: Optional[str] = None,
+        field_patterns: Optional[Dict[str, str]] = None,
         **kwargs,
     ):
         """
@@ -45,6 +78,24 @@ class PatternCatalog(Catalog):
         listable: bool
             Whether or not to construct a list of all the matching entries when the
             catalog is instantiated
+        shared_listing: bool
+            Whether to share the list of matching files with other catalogs in this
+            process that glob the same path on the same filesystem, so that only one
+            of them lists the path each time the ttl runs out
+        index: str
+            Location of an index file (can be remote) written by
+            `python -m intake_pattern_catalog index` or `write_index`, opened with
+            the catalog's storage_options. The initial entries are loaded from it
+            instead of listing the pattern; later reloads list the pattern as
+            usual. If the index is missing or was written for another pattern, a
+            warning is given and the pattern is listed instead.
+        field_patterns: dict
+            Regular expressions that the values of some of the pattern's fields must
+            match (e.g. {"date": "[0-9]{8}", "path": ".+"}). Paths are then listed one
+            directory level at a time, skipping directories whose names don't match,
+            and only fields whose pattern can contain `/` are searched recursively.
+            Fields without a pattern match anything, including `/`'s if
+            `recursive_glob` is set.
         """
         if urlpath == "reference://":
             urlpath = kwargs["storage_options"]["fo"]
@@ -60,25 +111,69 @@ class PatternCatalog(Catalog):
         self.driver = driver
         self.listable = listable
         self.recursive_glob = recursive_glob
+        self.shared_listing = shared_listing
+        self.field_patterns = field_patterns or {}
         self.metadata = kwargs.get("metadata", {})
 
         self._kwarg_sets: List[Dict[str, str]] = []
-
-        self._glob_path = path_to_glob(self.urlpath)
-        if self.recursive_glob:
-            self._glob_path = self._glob_path.replace("*", "**")
+        self._listing: Optional[ListingSnapshot] = None
+        self._file_info: Dict[str, Dict[str, Any]] = {}
+        # Asynchronous filesystem instance, its session and a finalizer closing the
+        # session once the loop has stopped, for each event loop
+        self._async_filesystems: Dict[
+            asyncio.AbstractEventLoop,
+            Tuple[Optional[AsyncFileSystem], Any, Optional[finalize]],
+        ] = {}
+        self._async_fs_tasks: MutableMapping[
+            asyncio.AbstractEventLoop, "asyncio.Task[Optional[AsyncFileSystem]]"
+        ] = WeakKeyDictionary()
+        self._reload_tasks: MutableMapping[
+            asyncio.AbstractEventLoop, "asyncio.Task[None]"
+        ] = WeakKeyDictionary()
+
+        # Fields which can contain `/`, and so need to be globbed recursively
+        self._slash_fields = {
+            field
+            for field in fields(self.urlpath)
+            if (
+                may_contain_slash(self.field_patterns[field])
+                if field in self.field_patterns
+                else self.recursive_glob
+            )
+        }
+        if self.field_patterns:
+            self._glob_path = pattern_to_glob(
+                self.urlpath, lambda f: "**" if f in self._slash_fields else "*"
+            )
+            self._path_regex = pattern_regex(
+                self._pattern,
+                self.field_patterns,
+                lambda f: ".*?" if f in self._slash_fields else "[^/]*?",
+            )
+        else:
+            self._glob_path = path_to_glob(self.urlpath)
+            if self.recursive_glob:
+                self._glob_path = self._glob_path.replace("*", "**")
         if self.urlpath == self._glob_path:
             raise ValueError("Path must contain one or more `{}` patterns.")
 
+        # Until construction finishes, loading may reuse another catalog's listing
+        self._constructed = False
         storage_options = kwargs.pop("storage_options", {})
 
         # Set use_listing_cache to False so that once the ttl runs
         # out, the fsspec cache doesn't keep the entry list from getting updated
         if "use_listings_cache" not in storage_options:
             storage_options["use_listings_cache"] = False
+
+        self.index = index
+        self._index_listing: Optional[ListingSnapshot] = None
+        if index is not None and listable:
+            self._index_listing = self._read_index(index, storage_options)
         super(PatternCatalog, self).__init__(
             ttl=ttl, storage_options=storage_options, **kwargs
         )
+        self._constructed = True
 
     @property
     def _pattern(self):
@@ -104,26 +199,93 @@ class PatternCatalog(Catalog):
         name = PatternCatalog._entry_name(kwargs)
         if not self.listable and name not in self._get_entries():
             urlpath = self.get_entry_path(**kwargs)
+            self._check_field_patterns(urlpath, kwargs)
             if self._exists(urlpath) is False:
                 raise KeyError(f"{urlpath} not found")
+            self._add_entry(name, urlpath, kwargs)
+        return self._get_entries()[name].get()
 
-            so = self.storage_options
-            if self.reference:
-                so["fo"] = urlpath
+    async def aget_entry(self, **kwargs) -> DataSource:
+        """
+        Asynchronous version of get_entry, which reloads the catalog and checks
+        that unlisted entries exist without blocking the event loop
 
-            entry = _local_catalog_entry(
-                name=name,
-                urlpath=urlpath if not self.reference else "reference://",
-                description=self.description,
-                filesystem=self.filesystem,
-                driver=self.driver,
-                metadata=self.metadata,
-                driver_kwargs=self.driver_kwargs,
-                storage_options=so,
-            )
-            self._entries[name] = entry
-            self._kwarg_sets.append(kwargs)
-        return self._get_entries()[name].get()
+        Raises a KeyError if the entry is not found
+        """
+        await self._areload()
+        return await self._aget_entry(**kwargs)
+
+    async def _aget_entry(self, **kwargs) -> DataSource:
+        # aget_entry without reloading first
+        name = PatternCatalog._entry_name(kwargs)
+        if not self.listable and name not in self._entries:
+            urlpath = self.get_entry_path(**kwargs)
+            self._check_field_patterns(urlpath, kwargs)
+            if await self._aexists(urlpath) is False:
+                raise KeyError(f"{urlpath} not found")
+            self._add_entry(name, urlpath, kwargs)
+        return self._entries[name].get()
+
+    async def aget_entries(
+        self,
+        kwarg_sets: Optional[Iterable[Mapping[str, str]]] = None,
+        modified_since: Optional[Union[datetime, float]] = None,
+        min_size: Optional[int] = None,
+    ) -> List[DataSource]:
+        """
+        Get the entries for several kwarg sets concurrently. Without kwarg_sets,
+        get every listed entry matching the query filters (see `query`).
+        """
+        # Reload once up front, so that every entry is looked up in the same listing
+        await self._areload()
+        if kwarg_sets is None:
+            kwarg_sets = self._query(modified_since, min_size)
+        return list(
+            await asyncio.gather(*(self._aget_entry(**kwargs) for kwargs in kwarg_sets))
+        )
+
+    async def aiter_entries(
+        self,
+        modified_since: Optional[Union[datetime, float]] = None,
+        min_size: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[Dict[str, str], DataSource]]:
+        """
+        Asynchronously iterate over the kwarg sets and entries of listed entries
+        matching the query filters (see `query`), reloading first if the ttl has run
+        out
+        """
+        await self._areload()
+        for kwargs in self._query(modified_since, min_size):
+            yield kwargs, self._entries[PatternCatalog._entry_name(kwargs)].get()
+
+    def _check_field_patterns(self, urlpath: str, kwargs: Mapping[str, Any]):
+        for field, field_pattern in self.field_patterns.items():
+            if field in kwargs and not re.fullmatch(field_pattern, str(kwargs[field])):
+                raise KeyError(
+                    f"{urlpath} not found ({field} doesn't match {field_pattern})"
+                )
+
+    def _add_entry(self, name: str, urlpath: str, kwargs: Dict[str, str]):
+        """Add an entry which has been found without listing"""
+        if name in self._entries:
+            return
+
+        so = self.storage_options
+        if self.reference:
+            so["fo"] = urlpath
+
+        entry = _local_catalog_entry(
+            name=name,
+            urlpath=urlpath if not self.reference else "reference://",
+            description=self.description,
+            filesystem=self.filesystem,
+            driver=self.driver,
+            metadata=self.metadata,
+            driver_kwargs=self.driver_kwargs,
+            storage_options=so,
+        )
+        self._entries[name] = entry
+        self._kwarg_sets.append(kwargs)
 
     def get_fs(self):
         if self.filesystem is None:
@@ -141,53 +303,349 @@ class PatternCatalog(Catalog):
     def get_entry_path(self, **kwargs) -> DataSource:
         return self.urlpath_with_fsspec_prefix.format(**kwargs)
 
-    def _load(self, reload=False):
+    def iter_entries(
+        self,
+        kwarg_sets: Optional[Iterable[Mapping[str, str]]] = None,
+        prefetch: int = 2,
+        max_bytes: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+    ) -> EntryPrefetcher:
+        """
+        Iterate over (kwarg set, entry) pairs in order, downloading the files of the
+        next `prefetch` entries to a local cache in the background so that reading
+        each entry can start straight away
+
+        Parameters
+        ----------
+        kwarg_sets: iterable of dicts
+            Kwarg sets of the entries to iterate over, in order. Defaults to
+            get_entry_kwarg_sets().
+        prefetch: int
+            How many entries after the current one to download ahead of time
+        max_bytes: int
+            Maximum total size of the files held in the cache
+        cache_dir: str
+            Local directory to download files into. Defaults to a temporary
+            directory which is removed when the iteration finishes.
+
+        Returns an EntryPrefetcher, which also counts cache hits and misses.
+        """
+        if kwarg_sets is None:
+            kwarg_sets = self.get_entry_kwarg_sets()
+        return EntryPrefetcher(self, kwarg_sets, prefetch, max_bytes, cache_dir)
+
+    @reload_on_change
+    def query(
+        self,
+        modified_since: Optional[Union[datetime, float]] = None,
+        min_size: Optional[int] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Return the kwarg sets of listed entries matching all of the given filters,
+        using the file info recorded when the pattern was listed
+
+        Parameters
+        ----------
+        modified_since: datetime or float
+            Only include files modified after this time (datetime or POSIX
+            timestamp). Files whose modification time is unknown are included.
+        min_size: int
+            Only include files of at least this many bytes. Files whose size is
+            unknown are included.
+        """
+        return self._query(modified_since, min_size)
+
+    def _query(
+        self,
+        modified_since: Optional[Union[datetime, float]] = None,
+        min_size: Optional[int] = None,
+    ) -> List[Dict[str, str]]:
+        if isinstance(modified_since, datetime):
+            modified_since = modified_since.timestamp()
+        matches = []
+        for kwargs in self._kwarg_sets:
+            info = self._file_info.get(PatternCatalog._entry_name(kwargs), {})
+            mtime, size = info.get("mtime"), info.get("size")
+            if modified_since is not None and mtime is not None:
+                if mtime <= modified_since:
+                    continue
+            if min_size is not None and size is not None and size < min_size:
+                continue
+            matches.append(kwargs)
+        return matches
+
+    def force_reload(self):
+        """
+        Imperative reload data now. Lists the pattern again rather than reusing a
+        listing shared by another catalog, though a listing of the same path already
+        in flight is waited for and used.
+        """
+        self.updated = time.time()
+        self._load(max_age=0 if self._constructed else self.ttl)
+
+    def reload(self):
+        """
+        Reload catalog if sufficient time has passed, reusing a listing shared by
+        another catalog if it is younger than the ttl
+        """
+        if (self.ttl is not None) and (time.time() - self.updated > self.ttl):
+            self.updated = time.time()
+            self._load(max_age=self.ttl)
+
+    def _load(self, reload=False, max_age: Optional[float] = 0):
         # Don't try and get all the entries for very large patterns
         if not self.listable:
             return
         if self.autoreload or reload:
-            try:
-                # Check for permission to inspect path before attempting to expand
-                # the glob. (Async globbing doesn't always raise exception.)
-                self._exists(self._glob_path)
-            except PermissionError as e:
-                raise e
-
-            paths = self.get_fs().glob(self._glob_path)
-
-            patterns: Dict[str, List[str]] = reverse_formats(self._pattern, paths)
-            value_names = list(patterns.keys())
-            self._entries = {}
-            self._kwarg_sets = []
-            for values in zip(*patterns.values()):
-                value_map = {k: v for k, v in zip(value_names, values)}
-                self._kwarg_sets.append(value_map)
-                urlpath = self.get_entry_path(**value_map)
-                name = PatternCatalog._entry_name(value_map)
-
-                so = self.storage_options
-                if self.reference:
-                    so["fo"] = urlpath
-
-                entry = _local_catalog_entry(
-                    name=name,
-                    urlpath=urlpath if not self.reference else "reference://",
-                    description=self.description,
-                    filesystem=self.filesystem,
-                    driver=self.driver,
-                    metadata=self.metadata,
-                    driver_kwargs=self.driver_kwargs,
-                    storage_options=so,
+            if self._index_listing is not None:
+                listing, self._index_listing = self._index_listing, None
+            elif self.shared_listing:
+                listing = listing_registry.get(
+                    self._listing_key(), self._list_paths, max_age
                 )
-                if entry.name in self._entries:
-                    warnings.warn(
-                        "intake-pattern-catalog failed to generate an entry for "
-                        f"pattern {value_map} because entry named {entry.name} "
-                        "already exists. (Non-alphanumeric characters "
-                        "are converted to underscores by Pattern Catalog driver.)"
-                    )
-                    continue
-                self._entries[entry.name] = entry
+            else:
+                listing = ListingSnapshot(details=self._list_paths())
+            if listing is not self._listing:
+                self._apply_listing(listing)
+
+    async def aload(self, reload=False):
+        """
+        Asynchronous version of force_reload: list the pattern on the running event
+        loop, using the filesystem's coroutines if it has them (and a thread if it
+        doesn't), and rebuild the entries
+        """
+        await self._aload(reload, max_age=0)
+
+    async def _aload(self, reload=False, max_age: Optional[float] = 0):
+        self.updated = time.time()
+        if not self.listable:
+            return
+        if self.autoreload or reload:
+            if self._index_listing is not None:
+                listing, self._index_listing = self._index_listing, None
+            elif self.shared_listing:
+                listing = await listing_registry.aget(
+                    self._listing_key(), self._alist_paths, max_age
+                )
+            else:
+                listing = ListingSnapshot(details=await self._alist_paths())
+            if listing is not self._listing:
+                self._apply_listing(listing)
+
+    async def _areload(self):
+        """
+        Asynchronous version of reload. Coroutines on the same event loop that call
+        this while a reload is in flight await that reload rather than carrying on
+        with the entries from before it.
+        """
+        loop = asyncio.get_running_loop()
+        task = self._reload_tasks.get(loop)
+        if task is None:
+            if (self.ttl is None) or (time.time() - self.updated <= self.ttl):
+                return
+            task = loop.create_task(self._aload(max_age=self.ttl))
+            self._reload_tasks[loop] = task
+            task.add_done_callback(lambda _: self._reload_tasks.pop(loop, None))
+        # Shield so one caller being cancelled doesn't cancel the others' reload
+        await asyncio.shield(task)
+
+    def _read_index(
+        self, index: str, storage_options: Mapping[str, Any]
+    ) -> Optional[ListingSnapshot]:
+        try:
+            glob_path, listing = read_index(index, storage_options)
+        except FileNotFoundError:
+            warnings.warn(f"Ignoring index {index} because it doesn't exist")
+            return None
+        if glob_path != self._glob_path:
+            warnings.warn(
+                f"Ignoring index {index} because it was written for {glob_path}, "
+                f"not {self._glob_path}"
+            )
+            return None
+        return listing
+
+    def write_index(self, path: str) -> ListingSnapshot:
+        """
+        List the pattern now and write the matches to an index file at path (can be
+        remote, opened with the catalog's storage_options), which can be passed as
+        `index` to start a PatternCatalog without listing
+        """
+        listing = ListingSnapshot(details=self._list_paths())
+        if self.shared_listing:
+            listing_registry.put(self._listing_key(), listing, self.ttl)
+        if self.listable:
+            self._apply_listing(listing)
+        write_index(
+            path,
+            self.urlpath_with_fsspec_prefix,
+            self._glob_path,
+            listing,
+            self._parse_paths(listing.paths),
+            self.storage_options,
+        )
+        return listing
+
+    def _listing_key(self):
+        return listing_registry.key(
+            self.get_fs(), self._glob_path, self.storage_options, self.field_patterns
+        )
+
+    def _parse_paths(self, paths: List[str]) -> Dict[str, Dict[str, str]]:
+        """Map each path matching the pattern to its kwarg set"""
+        if self.field_patterns:
+            matches = {path: self._path_regex.fullmatch(path) for path in paths}
+            return {path: m.groupdict() for path, m in matches.items() if m}
+        patterns: Dict[str, List[str]] = reverse_formats(self._pattern, paths)
+        return {
+            path: dict(zip(patterns.keys(), values))
+            for path, values in zip(paths, zip(*patterns.values()))
+        }
+
+    def _apply_listing(self, listing: ListingSnapshot):
+        """Rebuild the entries from a listing"""
+        self._listing = listing
+        previous_entries, previous_info = self._entries, self._file_info
+        self._entries = {}
+        self._file_info = {}
+        self._kwarg_sets = []
+        for path, value_map in self._parse_paths(listing.paths).items():
+            self._kwarg_sets.append(value_map)
+            urlpath = self.get_entry_path(**value_map)
+            name = PatternCatalog._entry_name(value_map)
+            info = file_info(listing.details[path])
+
+            if name not in self._entries and _unchanged(info, previous_info.get(name)):
+                # The object hasn't been rewritten, so keep the existing entry
+                self._entries[name] = previous_entries[name]
+                self._file_info[name] = info
+                continue
+
+            so = self.storage_options
+            if self.reference:
+                so["fo"] = urlpath
+
+            entry = _local_catalog_entry(
+                name=name,
+                urlpath=urlpath if not self.reference else "reference://",
+                description=self.description,
+                filesystem=self.filesystem,
+                driver=self.driver,
+                metadata={**self.metadata, "file_info": info},
+                driver_kwargs=self.driver_kwargs,
+                storage_options=so,
+            )
+            if entry.name in self._entries:
+                warnings.warn(
+                    "intake-pattern-catalog failed to generate an entry for "
+                    f"pattern {value_map} because entry named {entry.name} "
+                    "already exists. (Non-alphanumeric characters "
+                    "are converted to underscores by Pattern Catalog driver.)"
+                )
+                continue
+            self._entries[entry.name] = entry
+            self._file_info[entry.name] = info
+
+    def _list_paths(self) -> Dict[str, Dict[str, Any]]:
+        if self.field_patterns:
+            # Listing each level with ls raises on permission errors itself, and
+            # checking with _exists would expand the whole glob
+            return walk_pattern(
+                self.get_fs(), self._pattern, self.field_patterns, self._slash_fields
+            )
+
+        try:
+            # Check for permission to inspect path before attempting to expand
+            # the glob. (Async globbing doesn't always raise exception.)
+            self._exists(self._glob_path)
+        except PermissionError as e:
+            raise e
+
+        return self.get_fs().glob(self._glob_path, detail=True)
+
+    async def _alist_paths(self) -> Dict[str, Dict[str, Any]]:
+        fs = await self._aget_fs()
+        if fs is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._list_paths
+            )
+        if self.field_patterns:
+            return await awalk_pattern(
+                fs, self._pattern, self.field_patterns, self._slash_fields
+            )
+
+        # Check for permission to inspect path before attempting to expand the glob,
+        # as _list_paths does
+        await self._aexists(self._glob_path)
+        return await fs._glob(self._glob_path, detail=True)
+
+    async def aclose(self):
+        """
+        Close the session of the asynchronous filesystem used on the running event
+        loop. Call this before the loop finishes; otherwise the session's connections
+        are only closed once the loop has been closed and the catalog is used on
+        another loop, or the catalog is garbage collected.
+        """
+        _, session, finalizer = self._async_filesystems.pop(
+            asyncio.get_running_loop(), (None, None, None)
+        )
+        if finalizer is not None:
+            finalizer.detach()
+        if session is not None:
+            await session.close()
+
+    async def _aget_fs(self) -> Optional[AsyncFileSystem]:
+        """
+        Return an instance of the catalog's filesystem running on the current event
+        loop, made with the same class and arguments as get_fs(), or None if the
+        filesystem has no asynchronous implementation. Coroutines asking for it
+        while it is being created await the same creation task.
+        """
+        loop = asyncio.get_running_loop()
+        if loop in self._async_filesystems:
+            return self._async_filesystems[loop][0]
+        task = self._async_fs_tasks.get(loop)
+        if task is None:
+            task = loop.create_task(self._anew_fs(loop))
+            self._async_fs_tasks[loop] = task
+            task.add_done_callback(lambda _: self._async_fs_tasks.pop(loop, None))
+        # Shield so one caller being cancelled doesn't cancel the others' creation
+        return await asyncio.shield(task)
+
+    async def _anew_fs(
+        self, loop: asyncio.AbstractEventLoop
+    ) -> Optional[AsyncFileSystem]:
+        for other in list(self._async_filesystems):
+            if other.is_closed():
+                finalizer = self._async_filesystems.pop(other)[2]
+                if finalizer is not None:
+                    finalizer()
+
+        fs: Optional[AsyncFileSystem] = None
+        session = None
+        finalizer = None
+        sync_fs = self.get_fs()
+        if getattr(sync_fs, "async_impl", False):
+            # Not cached by fsspec, so the instance goes when the catalog does
+            fs = type(sync_fs)(
+                *sync_fs.storage_args,
+                **sync_fs.storage_options,
+                asynchronous=True,
+                loop=loop,
+                skip_instance_cache=True,
+            )
+            if hasattr(fs, "set_session"):
+                session = await fs.set_session()
+                finalizer = finalize(
+                    fs,
+                    _close_session,
+                    loop,
+                    getattr(fs, "close_session", None),
+                    # s3fs closes the client's creator rather than the client
+                    getattr(fs, "_s3creator", session),
+                )
+        self._async_filesystems[loop] = (fs, session, finalizer)
+        return fs
 
     @staticmethod
     def _trim_prefix(urlpath):
@@ -208,6 +666,45 @@ class PatternCatalog(Catalog):
         else:
             return self.get_fs().exists(p)
 
+    async def _aexists(self, urlpath: str) -> bool:
+        fs = await self._aget_fs()
+        if fs is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._exists, urlpath
+            )
+        p = PatternCatalog._trim_prefix(urlpath)
+        if "*" in p:
+            try:
+                await fs._expand_path(p)
+                return True
+            except FileNotFoundError:
+                return False
+        else:
+            return await fs._exists(p)
+
+
+def _close_session(
+    loop: asyncio.AbstractEventLoop,
+    close_session: Optional[Callable[[asyncio.AbstractEventLoop, Any], None]],
+    session: Any,
+) -> None:
+    """
+    Close the session of an asynchronous filesystem whose loop is no longer running
+    with the filesystem's close_session, as fsspec does for synchronous instances
+    """
+    if close_session is not None and not loop.is_running():
+        close_session(loop, session)
+
+
+def _unchanged(info: Mapping[str, Any], previous: Optional[Mapping[str, Any]]) -> bool:
+    """
+    Whether file info from a new listing shows the object hasn't been rewritten.
+    That needs a modification time or ETag, as a rewrite can keep the same size.
+    """
+    if previous is None or (info["mtime"] is None and info["etag"] is None):
+        return False
+    return dict(info) == dict(previous)
+
 
 def _local_catalog_entry(
     name: str,
@@ -305,7 +802,7 @@ class PatternCatalogTransform(GenericTransform):
     def to_dask(self):
         raise NotImplementedError("Must use get_entry(...).to_dask()")
 
-    def get_entry(self, **kwargs):
+    def _pattern_catalog(self) -> PatternCatalog:
         if not self._source_picked:
             self._pick()
             if not isinstance(self._source, PatternCatalog):
@@ -313,11 +810,34 @@ class PatternCatalogTransform(GenericTransform):
                     "PatternCatalogTransform only works with PatternCatalog targets"
                 )
             self._source_picked = True
+        return self._source
 
-        entry = self._source.get_entry(**kwargs)
-
-        transformed = PatternCatalogTransformedObject(
+    def _wrap(self, entry: DataSource) -> PatternCatalogTransformedObject:
+        return PatternCatalogTransformedObject(
             entry, self._transform, self._params["transform_kwargs"]
         )
 
+    def get_entry(self, **kwargs):
+        entry = self._pattern_catalog().get_entry(**kwargs)
+
+        transformed = self._wrap(entry)
+
         return transformed
+
+    def iter_entries(
+        self,
+        kwarg_sets: Optional[Iterable[Mapping[str, str]]] = None,
+        prefetch: int = 2,
+        max_bytes: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+    ) -> EntryPrefetcher:
+        """
+        Iterate over (kwarg set, transformed entry) pairs in order, prefetching the
+        files of upcoming entries (see PatternCatalog.iter_entries)
+        """
+        source = self._pattern_catalog()
+        if kwarg_sets is None:
+            kwarg_sets = source.get_entry_kwarg_sets()
+        return EntryPrefetcher(
+            source, kwarg_sets, prefetch, max_bytes, cache_dir, wrap=self._wrap
+        )
@@ -0,0 +1,59 @@
+import json
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import fsspec
+
+from .listing import ListingSnapshot, file_info
+
+INDEX_VERSION = 1
+
+
+def write_index(
+    path: str,
+    urlpath: str,
+    glob_path: str,
+    listing: ListingSnapshot,
+    kwarg_sets: Mapping[str, Dict[str, str]],
+    storage_options: Optional[Mapping[str, Any]] = None,
+) -> None:
+    """
+    Write a listing and the kwarg sets parsed from each of its paths to a JSON index
+    file at path (can be remote, opened with storage_options), which PatternCatalog
+    can load via its `index` argument
+    """
+    entries = [
+        {"path": p, "kwargs": kwargs, **file_info(listing.details[p])}
+        for p, kwargs in kwarg_sets.items()
+    ]
+    index = {
+        "version": INDEX_VERSION,
+        "urlpath": urlpath,
+        "glob_path": glob_path,
+        "timestamp": listing.timestamp,
+        "entries": entries,
+    }
+    with fsspec.open(path, "w", **(storage_options or {})) as f:
+        json.dump(index, f)
+
+
+def read_index(
+    path: str, storage_options: Optional[Mapping[str, Any]] = None
+) -> Tuple[str, ListingSnapshot]:
+    """
+    Read an index file written by write_index (opened with storage_options),
+    returning the glob path it was listed from and the listing itself
+    """
+    with fsspec.open(path, "r", **(storage_options or {})) as f:
+        index = json.load(f)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(
+            f"Unsupported index version {index.get('version')} in {path} "
+            f"(expected {INDEX_VERSION})"
+        )
+    details: Dict[str, Dict[str, Any]] = {
+        entry["path"]: {k: entry.get(k) for k in ("size", "mtime", "etag")}
+        for entry in index["entries"]
+    }
+    return index["glob_path"], ListingSnapshot(
+        details=details, timestamp=index["timestamp"]
+    )
@@ -0,0 +1,377 @@
+import asyncio
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+from weakref import WeakValueDictionary
+
+from fsspec import AbstractFileSystem
+from fsspec.asyn import AsyncFileSystem
+from fsspec.utils import tokenize
+
+from .patterns import fields, pattern_regex, pattern_to_glob
+
+# Keys different fsspec implementations use for the same piece of file info
+_MTIME_KEYS = ("mtime", "LastModified", "last_modified", "updated", "modified")
+_ETAG_KEYS = ("ETag", "etag", "md5Hash")
+
+
+def _as_timestamp(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        if isinstance(value, str):
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        return float(value)
+    except (TypeError, ValueError):
+        # Treat a format we don't know as an unknown modification time
+        return None
+
+
+def file_info(details: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize the details returned by ``fs.glob(..., detail=True)`` for a single
+    file into ``size`` (bytes), ``mtime`` (POSIX timestamp) and ``etag``, any of
+    which may be None if the filesystem doesn't report it
+    """
+    mtime = next((details[k] for k in _MTIME_KEYS if details.get(k)), None)
+    etag = next((details[k] for k in _ETAG_KEYS if details.get(k)), None)
+    return {
+        "size": details.get("size"),
+        "mtime": _as_timestamp(mtime),
+        "etag": etag.strip('"') if isinstance(etag, str) else etag,
+    }
+
+
+@dataclass(frozen=True)
+class ListingSnapshot:
+    """Result of expanding a glob path at a point in time"""
+
+    details: Dict[str, Dict[str, Any]]
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def paths(self) -> List[str]:
+        return list(self.details)
+
+
+class ListingRegistry:
+    """
+    Process-wide store of listing snapshots, shared between every PatternCatalog
+    that points at the same glob path on the same filesystem.
+
+    Concurrent requests for a stale listing are collapsed into a single call to the
+    loader: the first caller runs it while holding the key's lock, and everyone
+    else waiting on that lock picks up its result. Coroutines on the same event
+    loop calling aget likewise await a single loading task.
+
+    A snapshot is kept while any catalog refers to it, and otherwise until it is
+    older than the longest (finite) max_age it was requested with, so listings of
+    patterns that are no longer used don't stay in memory.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Lock for each key, with the number of callers holding or waiting for it
+        self._key_locks: Dict[Hashable, Tuple[threading.Lock, int]] = {}
+        self._snapshots: MutableMapping[
+            Hashable, ListingSnapshot
+        ] = WeakValueDictionary()
+        # Snapshots kept alive until they expire, with their expiry times
+        self._retained: Dict[Hashable, Tuple[ListingSnapshot, float]] = {}
+        self._tasks: Dict[
+            Tuple[Hashable, asyncio.AbstractEventLoop], "asyncio.Task[ListingSnapshot]"
+        ] = {}
+
+    @staticmethod
+    def key(
+        fs: AbstractFileSystem,
+        glob_path: str,
+        storage_options: Mapping[str, Any],
+        field_patterns: Optional[Mapping[str, str]] = None,
+    ) -> Tuple[AbstractFileSystem, str, str]:
+        return (fs, glob_path, tokenize(storage_options, field_patterns or {}))
+
+    @contextmanager
+    def _key_lock(self, key: Hashable) -> Iterator[None]:
+        with self._lock:
+            lock, users = self._key_locks.get(key, (threading.Lock(), 0))
+            self._key_locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._key_locks[key]
+                if users == 1:
+                    del self._key_locks[key]
+                else:
+                    self._key_locks[key] = (lock, users - 1)
+
+    def _retain(
+        self, key: Hashable, snapshot: ListingSnapshot, max_age: Optional[float]
+    ) -> None:
+        """
+        Keep snapshot alive until it is older than max_age, and drop expired
+        snapshots that no catalog refers to any more
+        """
+        now = time.time()
+        with self._lock:
+            for k, (_, expiry) in list(self._retained.items()):
+                if expiry < now:
+                    del self._retained[k]
+            if max_age is None or max_age <= 0:
+                return
+            expiry = snapshot.timestamp + max_age
+            retained = self._retained.get(key)
+            if retained is not None and retained[0] is snapshot:
+                expiry = max(expiry, retained[1])
+            if expiry >= now:
+                self._retained[key] = (snapshot, expiry)
+
+    def _fresh(
+        self, key: Hashable, started: float, max_age: Optional[float]
+    ) -> Optional[ListingSnapshot]:
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None and (
+            snapshot.timestamp >= started
+            or max_age is None
+            or time.time() - snapshot.timestamp <= max_age
+        ):
+            return snapshot
+        return None
+
+    def peek(self, key: Hashable) -> Optional[ListingSnapshot]:
+        """Return the current snapshot for key without loading, if there is one"""
+        return self._snapshots.get(key)
+
+    def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Dict[str, Dict[str, Any]]],
+        max_age: Optional[float],
+    ) -> ListingSnapshot:
+        """
+        Return the snapshot for key, calling loader if it is missing or older than
+        max_age seconds (``None`` means never expire).
+
+        A snapshot taken after this call started is always considered fresh, so
+        callers that queued up behind an in-flight load reuse its result.
+        """
+        started = time.time()
+        with self._key_lock(key):
+            snapshot = self._fresh(key, started, max_age)
+            if snapshot is None:
+                snapshot = ListingSnapshot(details=loader())
+                self._snapshots[key] = snapshot
+        self._retain(key, snapshot, max_age)
+        return snapshot
+
+    async def aget(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Dict[str, Dict[str, Any]]]],
+        max_age: Optional[float],
+    ) -> ListingSnapshot:
+        """
+        Asynchronous version of get, for a loader coroutine function. Never blocks
+        the event loop: callers needing a reload while one is already in flight on
+        the same loop await that load instead of starting another.
+        """
+        snapshot = self._fresh(key, time.time(), max_age)
+        if snapshot is not None:
+            self._retain(key, snapshot, max_age)
+            return snapshot
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get((key, loop))
+            if task is None:
+                task = loop.create_task(self._aload(key, loader, max_age))
+                self._tasks[(key, loop)] = task
+                task.add_done_callback(lambda _: self._tasks.pop((key, loop), None))
+        # Shield so one caller being cancelled doesn't cancel the others' load
+        return await asyncio.shield(task)
+
+    async def _aload(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Dict[str, Dict[str, Any]]]],
+        max_age: Optional[float],
+    ) -> ListingSnapshot:
+        snapshot = ListingSnapshot(details=await loader())
+        # Not put, whose key lock may be held by a thread listing the same key for
+        # as long as its listing takes
+        with self._lock:
+            self._snapshots[key] = snapshot
+        self._retain(key, snapshot, max_age)
+        return snapshot
+
+    def put(
+        self,
+        key: Hashable,
+        snapshot: ListingSnapshot,
+        max_age: Optional[float] = None,
+    ) -> None:
+        """
+        Store a snapshot that was listed outside of get, keeping it for max_age
+        seconds even if no catalog refers to it
+        """
+        with self._key_lock(key):
+            self._snapshots[key] = snapshot
+        self._retain(key, snapshot, max_age)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the snapshot for key so that the next get reloads it"""
+        with self._key_lock(key):
+            self._snapshots.pop(key, None)
+            with self._lock:
+                self._retained.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every snapshot held by the registry"""
+        with self._lock:
+            self._snapshots.clear()
+            self._retained.clear()
+
+
+listing_registry = ListingRegistry()
+
+
+def _join(directory: str, name: str) -> str:
+    return f"{directory}/{name}" if directory else name
+
+
+def _is_wild(segment: str) -> bool:
+    return bool(fields(segment)) or "*" in segment or "?" in segment
+
+
+def _split_root(pattern: str) -> Tuple[str, List[str]]:
+    """Split pattern into the directory before its first wildcard and the rest"""
+    segments = pattern.split("/")
+    root = 0
+    while root < len(segments) and not _is_wild(segments[root]):
+        root += 1
+    return "/".join(segments[:root]), segments[root:]
+
+
+def _select(
+    listing: List[Dict[str, Any]],
+    regex: "re.Pattern[str]",
+    last: bool,
+    found: Dict[str, Dict[str, Any]],
+    directories: List[str],
+) -> None:
+    # Keep the matches from one directory listing: files (or anything, on the last
+    # level) go in found, directories to descend into in directories
+    for details in listing:
+        name = details["name"].rstrip("/")
+        if not regex.fullmatch(name.rsplit("/", 1)[-1]):
+            continue
+        if last:
+            found[name] = details
+        elif details["type"] == "directory":
+            directories.append(name)
+
+
+def walk_pattern(
+    fs: AbstractFileSystem,
+    pattern: str,
+    field_patterns: Mapping[str, str],
+    slash_fields: Collection[str],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    List the paths matching pattern (without protocol) one directory level at a
+    time, only descending into directories whose names match the field patterns of
+    their level. From the first level with a field that can contain `/` onwards,
+    the rest of the pattern is globbed recursively.
+
+    Returns the details of each match, as ``fs.glob(..., detail=True)`` does.
+    """
+    root, segments = _split_root(pattern)
+    directories = [root]
+    found: Dict[str, Dict[str, Any]] = {}
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if "**" in segment or any(f in slash_fields for f in fields(segment)):
+            rest = pattern_to_glob(
+                "/".join(segments[i:]),
+                lambda f: "**" if f in slash_fields else "*",
+            )
+            for directory in directories:
+                found.update(fs.glob(_join(directory, rest), detail=True))
+            break
+        if not last and not _is_wild(segment):
+            directories = [_join(d, segment) for d in directories]
+            continue
+        regex = pattern_regex(segment, field_patterns, lambda f: "[^/]*")
+        next_directories: List[str] = []
+        for directory in directories:
+            try:
+                listing = fs.ls(directory, detail=True)
+            except FileNotFoundError:
+                continue
+            _select(listing, regex, last, found, next_directories)
+        directories = next_directories
+    return dict(sorted(found.items()))
+
+
+async def awalk_pattern(
+    fs: AsyncFileSystem,
+    pattern: str,
+    field_patterns: Mapping[str, str],
+    slash_fields: Collection[str],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Asynchronous version of walk_pattern, using fs's coroutines on the running
+    event loop and listing all the directories of a level concurrently
+    """
+
+    async def ls(directory: str) -> List[Dict[str, Any]]:
+        try:
+            return await fs._ls(directory, detail=True)
+        except FileNotFoundError:
+            return []
+
+    root, segments = _split_root(pattern)
+    directories = [root]
+    found: Dict[str, Dict[str, Any]] = {}
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if "**" in segment or any(f in slash_fields for f in fields(segment)):
+            rest = pattern_to_glob(
+                "/".join(segments[i:]),
+                lambda f: "**" if f in slash_fields else "*",
+            )
+            for matches in await asyncio.gather(
+                *(fs._glob(_join(d, rest), detail=True) for d in directories)
+            ):
+                found.update(matches)
+            break
+        if not last and not _is_wild(segment):
+            directories = [_join(d, segment) for d in directories]
+            continue
+        regex = pattern_regex(segment, field_patterns, lambda f: "[^/]*")
+        next_directories: List[str] = []
+        for listing in await asyncio.gather(*(ls(d) for d in directories)):
+            _select(listing, regex, last, found, next_directories)
+        directories = next_directories
+    return dict(sorted(found.items()))
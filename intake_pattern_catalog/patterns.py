@@ -0,0 +1,71 @@
+import re
+from string import Formatter
+from typing import Callable, List, Mapping, Optional, Tuple
+
+# Strings used to check whether a field's pattern can match across a `/`
+_SLASH_PROBES = ("/", "a/a", "0/0", "a/a/a")
+
+
+def may_contain_slash(field_pattern: str) -> bool:
+    """Whether values matching a field's regex can contain `/` (best effort)"""
+    if "/" in field_pattern:
+        return True
+    regex = re.compile(field_pattern)
+    for probe in _SLASH_PROBES:
+        match = regex.search(probe)
+        if match is not None and "/" in match.group():
+            return True
+    return False
+
+
+def _parse(pattern: str) -> List[Tuple[str, Optional[str]]]:
+    return [(text, field) for text, field, _, _ in Formatter().parse(pattern)]
+
+
+def pattern_to_glob(pattern: str, wildcard: Callable[[str], str]) -> str:
+    """Replace each `{field}` in pattern with wildcard(field)"""
+    return "".join(
+        text + (wildcard(field) if field is not None else "")
+        for text, field in _parse(pattern)
+    )
+
+
+def _glob_text_to_regex(text: str) -> str:
+    # Globs written directly in the pattern (e.g. folder/{a}/*.csv) are passed
+    # through, so translate them too
+    out = re.escape(text)
+    out = out.replace(r"\*\*", ".*").replace(r"\*", "[^/]*").replace(r"\?", "[^/]")
+    return out
+
+
+def pattern_regex(
+    pattern: str,
+    field_patterns: Mapping[str, str],
+    default: Callable[[str], str],
+) -> "re.Pattern[str]":
+    """
+    Compile a regex matching the full paths described by pattern, with a named
+    group for each field. Fields in field_patterns use that regex, others use
+    default(field).
+    """
+    parts = []
+    seen = set()
+    for text, field in _parse(pattern):
+        parts.append(_glob_text_to_regex(text))
+        if field is None:
+            continue
+        if field in seen:
+            parts.append(f"(?P={field})")
+        else:
+            seen.add(field)
+            parts.append(f"(?P<{field}>{field_patterns.get(field, default(field))})")
+    return re.compile("".join(parts))
+
+
+def fields(pattern: str) -> List[str]:
+    """Names of the fields in pattern, in order of first appearance"""
+    names: List[str] = []
+    for _, field in _parse(pattern):
+        if field is not None and field not in names:
+            names.append(field)
+    return names
@@ -0,0 +1,281 @@
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+import fsspec
+from intake.source.base import DataSource
+
+if TYPE_CHECKING:
+    from .catalog import PatternCatalog
+
+
+class EntryPrefetcher:
+    """
+    Iterates over entries of a PatternCatalog in order, downloading the files of the
+    next `prefetch` entries into a local cache in the background while the caller
+    works on the current one.
+
+    Files are downloaded through fsspec's `simplecache` filesystem, and an entry
+    whose file has been prefetched reads the local copy. A file is deleted from the
+    cache once the iteration moves past its entry; reading that entry afterwards
+    (including after the iteration has finished) reads the original file instead.
+    Dask collections made from an entry read the local copy, so compute them before
+    moving on to the next entry.
+
+    The cache directory and download threads are only set up while iterating, and
+    each iteration starts afresh.
+
+    Counts of prefetched entries which were ready when they were reached (`hits`)
+    and which had to be waited for or couldn't be prefetched (`misses`) are kept,
+    along with the number of bytes downloaded (`bytes_prefetched`).
+    """
+
+    def __init__(
+        self,
+        catalog: "PatternCatalog",
+        kwarg_sets: Iterable[Mapping[str, str]],
+        prefetch: int = 2,
+        max_bytes: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        wrap: Optional[Callable[[DataSource], Any]] = None,
+    ):
+        """
+        Parameters
+        ----------
+        catalog: PatternCatalog
+            Catalog to get the entries from
+        kwarg_sets: iterable of dicts
+            Kwarg sets of the entries to iterate over, in order
+        prefetch: int
+            How many entries after the current one to download ahead of time
+        max_bytes: int
+            Maximum total size of the files held in the cache. Entries whose size
+            wasn't recorded when listing count as 0 bytes until downloaded. The
+            current entry is always downloaded, even if it doesn't fit.
+        cache_dir: str
+            Local directory to download files into. Defaults to a temporary
+            directory which is created when the iteration starts and removed when it
+            finishes.
+        wrap: callable
+            Applied to each entry before it's yielded
+        """
+        if prefetch < 0:
+            raise ValueError("prefetch must be at least 0")
+        self.catalog = catalog
+        self.kwarg_sets = [dict(kwargs) for kwargs in kwarg_sets]
+        self.prefetch = prefetch
+        self.max_bytes = max_bytes
+        self.wrap = wrap
+        self._own_cache_dir = cache_dir is None
+        self.cache_dir = cache_dir
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_prefetched = 0
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[int, Future] = {}
+        # Files downloaded by the worker threads, by index into kwarg_sets
+        self._lock = threading.Lock()
+        self._cached: Dict[int, Tuple[str, int]] = {}
+        self._storage_options: Dict[str, Any] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"<EntryPrefetcher hits={self.hits} misses={self.misses} "
+            f"bytes_prefetched={self.bytes_prefetched}>"
+        )
+
+    def __enter__(self) -> "EntryPrefetcher":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.kwarg_sets)
+
+    def __iter__(self) -> Iterator[Tuple[Dict[str, str], Any]]:
+        self.close()
+        pool = self._open()
+        try:
+            submitted = 0
+            for i, kwargs in enumerate(self.kwarg_sets):
+                self._evict(i - 1)
+                while (
+                    submitted < len(self.kwarg_sets) and submitted <= i + self.prefetch
+                ):
+                    if submitted > i and not self._fits(submitted):
+                        break
+                    self._futures[submitted] = pool.submit(self._fetch, submitted)
+                    submitted += 1
+
+                future = self._futures.pop(i)
+                ready = future.done()
+                path = future.result()
+                entry = self.catalog.get_entry(**kwargs)
+                if path is None:
+                    self.misses += 1
+                else:
+                    self.hits += ready
+                    self.misses += not ready
+                    entry = PrefetchedEntry(self, i, self._entry(kwargs, path), entry)
+                yield kwargs, self.wrap(entry) if self.wrap else entry
+        finally:
+            self.close()
+
+    def _open(self) -> ThreadPoolExecutor:
+        """Set up the cache directory and download threads for an iteration"""
+        if self._own_cache_dir:
+            self.cache_dir = tempfile.mkdtemp(prefix="intake-pattern-cat-")
+        assert self.cache_dir is not None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fs = self.catalog.get_fs()
+        protocol = fs.protocol if isinstance(fs.protocol, str) else fs.protocol[0]
+        self._storage_options = {
+            "simplecache": {"cache_storage": self.cache_dir},
+            protocol: self.catalog.storage_options,
+        }
+        self._pool = ThreadPoolExecutor(max_workers=max(self.prefetch, 1))
+        return self._pool
+
+    def close(self):
+        """Stop prefetching and remove the downloaded files"""
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+        self._futures.clear()
+        for i in list(self._cached):
+            self._evict(i)
+        if self._own_cache_dir and self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self.cache_dir = None
+
+    def is_cached(self, i: int) -> bool:
+        """Whether the file of the i-th entry is currently held in the cache"""
+        with self._lock:
+            return i in self._cached
+
+    def _url(self, kwargs: Mapping[str, str]) -> Optional[str]:
+        """simplecache URL to read an entry through, if it can be prefetched"""
+        catalog = self.catalog
+        urlpath = catalog.get_entry_path(**kwargs)
+        # Already chained or kerchunk entries, and entries globbing several files,
+        # are read as they are
+        if catalog.reference or "::" in urlpath or "*" in urlpath:
+            return None
+        fs = catalog.get_fs()
+        return "simplecache::" + fs.unstrip_protocol(fs._strip_protocol(urlpath))
+
+    def _fetch(self, i: int) -> Optional[str]:
+        url = self._url(self.kwarg_sets[i])
+        if url is None:
+            return None
+        try:
+            path = fsspec.open_local(url, **self._storage_options)
+        except (OSError, ValueError):
+            # e.g. the entry is a directory; leave it to the driver
+            return None
+        size = os.path.getsize(path)
+        with self._lock:
+            self._cached[i] = (path, size)
+            self.bytes_prefetched += size
+        return path
+
+    def _expected_size(self, i: int) -> int:
+        name = self.catalog._entry_name(self.kwarg_sets[i])
+        return self.catalog._file_info.get(name, {}).get("size") or 0
+
+    def _fits(self, i: int) -> bool:
+        """Whether prefetching entry i keeps the cache within max_bytes"""
+        if self.max_bytes is None:
+            return True
+        # Check pending downloads first, so one finishing in between is counted twice
+        # rather than not at all
+        pending = sum(
+            self._expected_size(j)
+            for j, future in self._futures.items()
+            if not future.done()
+        )
+        with self._lock:
+            held = sum(size for _, size in self._cached.values())
+        return held + pending + self._expected_size(i) <= self.max_bytes
+
+    def _evict(self, i: int):
+        with self._lock:
+            path, _ = self._cached.pop(i, (None, 0))
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def _entry(self, kwargs: Mapping[str, str], path: str) -> DataSource:
+        """Entry reading the downloaded copy of the file at path"""
+        from .catalog import _local_catalog_entry
+
+        catalog = self.catalog
+        name = catalog._entry_name(kwargs)
+        metadata = dict(catalog.metadata)
+        if name in catalog._file_info:
+            metadata["file_info"] = catalog._file_info[name]
+        return _local_catalog_entry(
+            name=name,
+            urlpath=path,
+            description=catalog.description,
+            filesystem=catalog.filesystem,
+            driver=catalog.driver,
+            metadata=metadata,
+            driver_kwargs=catalog.driver_kwargs,
+            storage_options={},
+        ).get()
+
+
+class PrefetchedEntry:
+    """
+    Entry yielded by EntryPrefetcher for a prefetched file. Reads use the local copy
+    while it is in the cache and the original entry once it has been evicted; any
+    other attribute is the original entry's.
+    """
+
+    def __init__(
+        self,
+        prefetcher: EntryPrefetcher,
+        index: int,
+        cached: DataSource,
+        original: DataSource,
+    ) -> None:
+        self.prefetcher = prefetcher
+        self.index = index
+        self.cached = cached
+        self.original = original
+
+    def __repr__(self) -> str:
+        return f"Prefetched entry:\n{repr(self.original)}"
+
+    @property
+    def _source(self) -> DataSource:
+        return self.cached if self.prefetcher.is_cached(self.index) else self.original
+
+    def read(self):
+        return self._source.read()
+
+    def to_dask(self):
+        return self._source.to_dask()
+
+    def discover(self):
+        return self._source.discover()
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
@@ -2,6 +2,7 @@
 Pytest Fixture Supporting S3FS Mocks from
 https://github.com/aio-libs/aiobotocore/issues/755#issuecomment-1424945194
 """
+import io
 import os
 from typing import Any, Callable
 from unittest.mock import MagicMock
@@ -17,6 +18,8 @@ import botocore.model
 import pytest
 from moto import mock_s3
 
+from intake_pattern_catalog.listing import listing_registry
+
 
 class MockAWSResponse(aiobotocore.awsrequest.AioAWSResponse):
     """
@@ -51,8 +54,12 @@ class MockHttpClientResponse(aiohttp.client_reqrep.ClientResponse):
         Mocked Response Init.
         """
 
-        async def read(self: MockHttpClientResponse, n: int = -1) -> bytes:
-            return response.content
+        # Read like a stream, so that chunked reads (e.g. s3fs get_file) see the
+        # end of the body
+        body = io.BytesIO(response.content)
+
+        async def read(n: int = -1) -> bytes:
+            return body.read(n)
 
         self.content = MagicMock(aiohttp.StreamReader)
         self.content.read = read
@@ -108,3 +115,11 @@ def aws_credentials():
 def s3(aws_credentials):
     with mock_s3():
         yield boto3.client("s3", region_name="us-east-1")
+
+
+@pytest.fixture(autouse=True)
+def clear_listing_registry():
+    """Keep listings from leaking between tests that reuse the same paths"""
+    listing_registry.clear()
+    yield
+    listing_registry.clear()
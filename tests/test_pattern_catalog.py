@@ -1,14 +1,25 @@
+import asyncio
+import gc
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
 from tempfile import TemporaryDirectory
-from time import sleep
-from typing import Generator
+from threading import Barrier, Event
+from time import perf_counter, sleep
+from typing import Generator, List
 
+import fsspec
 import intake
 import pandas as pd
 import pytest
+from fsspec.implementations.local import LocalFileSystem
 from pandas.testing import assert_frame_equal
+from s3fs import S3FileSystem
 
 from intake_pattern_catalog import PatternCatalog, PatternCatalogTransform
+from intake_pattern_catalog.__main__ import main
+from intake_pattern_catalog.listing import file_info, listing_registry
 
 
 @pytest.fixture(
@@ -357,3 +368,645 @@ def test_kerchunk_reference_files(folder_with_csvs: str):
 
     # Make sure I can access a valid entry without error
     assert cat.get_entry(num=1)
+
+
+@pytest.fixture
+def glob_calls(monkeypatch) -> List[str]:
+    calls: List[str] = []
+    original = PatternCatalog._list_paths
+
+    def counting_list_paths(self):
+        calls.append(self._glob_path)
+        return original(self)
+
+    monkeypatch.setattr(PatternCatalog, "_list_paths", counting_list_paths)
+    return calls
+
+
+def test_shared_listing(folder_with_csvs: str, glob_calls: List[str]):
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    cat1 = PatternCatalog(name="cat1", urlpath=urlpath, driver="csv")
+    cat2 = PatternCatalog(name="cat2", urlpath=urlpath, driver="csv")
+    assert len(glob_calls) == 1
+    assert cat1.get_entry_kwarg_sets() == cat2.get_entry_kwarg_sets()
+    assert len(cat2) == 10
+
+
+def test_shared_listing_disabled(folder_with_csvs: str, glob_calls: List[str]):
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    PatternCatalog(name="cat1", urlpath=urlpath, driver="csv", shared_listing=False)
+    PatternCatalog(name="cat2", urlpath=urlpath, driver="csv", shared_listing=False)
+    assert len(glob_calls) == 2
+
+
+def test_shared_listing_ttl(folder_with_csvs: str, glob_calls: List[str]):
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    cat1 = PatternCatalog(name="cat1", urlpath=urlpath, driver="csv", ttl=0.1)
+    Path(folder_with_csvs, "10.csv").write_text("a\n10")
+    cat2 = PatternCatalog(name="cat2", urlpath=urlpath, driver="csv", ttl=0.1)
+    assert len(cat2) == 10
+    sleep(0.11)
+    assert len(cat2) == 11
+    # cat1's reload picks up the listing cat2 just made
+    assert len(cat1) == 11
+    assert len(glob_calls) == 2
+
+
+def test_shared_listing_released(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(Path(folder_with_csvs, "{num}.csv")),
+        driver="csv",
+        ttl=0.1,
+    )
+    key = cat._listing_key()
+    del cat
+    gc.collect()
+    # Kept for other catalogs until the ttl runs out, even with no catalog using it
+    assert listing_registry.peek(key) is not None
+    sleep(0.11)
+    # Expired snapshots are dropped the next time the registry is used
+    other = PatternCatalog(
+        name="other", urlpath=str(Path(folder_with_csvs, "{num}.txt")), driver="csv"
+    )
+    assert listing_registry.peek(key) is None
+    assert listing_registry.peek(other._listing_key()) is not None
+    assert listing_registry._key_locks == {}
+
+
+def test_shared_listing_force_reload(folder_with_csvs: str):
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    cat1 = PatternCatalog(name="cat1", urlpath=urlpath, driver="csv")
+    cat2 = PatternCatalog(name="cat2", urlpath=urlpath, driver="csv")
+    Path(folder_with_csvs, "10.csv").write_text("a\n10")
+    # An explicit reload lists again even though the shared listing is within ttl
+    cat1.force_reload()
+    assert len(cat1) == 11
+    Path(folder_with_csvs, "11.csv").write_text("a\n11")
+    asyncio.run(cat2.aload())
+    assert len(cat2) == 12
+
+
+def test_shared_listing_single_flight(
+    folder_with_csvs: str, glob_calls: List[str], monkeypatch
+):
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    cats = [
+        PatternCatalog(name=f"cat{i}", urlpath=urlpath, driver="csv", ttl=-1)
+        for i in range(8)
+    ]
+    glob_calls.clear()
+
+    # Make listing slow enough that every thread arrives while it's in flight
+    counting_list_paths = PatternCatalog._list_paths
+
+    def slow_list_paths(self):
+        sleep(0.2)
+        return counting_list_paths(self)
+
+    monkeypatch.setattr(PatternCatalog, "_list_paths", slow_list_paths)
+    barrier = Barrier(len(cats))
+
+    def reload(cat: PatternCatalog) -> int:
+        barrier.wait()
+        return len(cat.get_entry_kwarg_sets())
+
+    with ThreadPoolExecutor(len(cats)) as pool:
+        assert list(pool.map(reload, cats)) == [10] * len(cats)
+    assert len(glob_calls) == 1
+
+
+def test_file_info_metadata(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat", urlpath=str(Path(folder_with_csvs, "{num}.csv")), driver="csv"
+    )
+    path = Path(folder_with_csvs, "1.csv")
+    info = cat.get_entry(num="1").metadata["file_info"]
+    assert info["size"] == path.stat().st_size
+    assert info["mtime"] == path.stat().st_mtime
+
+
+def test_file_info_s3(example_bucket, s3):
+    s3.put_object(Body="a\n1", Bucket=example_bucket, Key="1.csv")
+    cat = PatternCatalog(
+        name="cat", urlpath="s3://" + example_bucket + "/{num}.csv", driver="csv"
+    )
+    head = s3.head_object(Bucket=example_bucket, Key="1.csv")
+    info = cat.get_entry(num="1").metadata["file_info"]
+    assert info["size"] == 3
+    assert info["etag"] == head["ETag"].strip('"')
+    assert info["mtime"] == head["LastModified"].timestamp()
+
+
+def test_query(folder_with_csvs: str):
+    Path(folder_with_csvs, "10.csv").write_text("a\n10\n20\n30")
+    cutoff = Path(folder_with_csvs, "10.csv").stat().st_mtime - 1
+    for i in range(10):
+        mtime = cutoff + 1 if i == 5 else cutoff - 1
+        os.utime(Path(folder_with_csvs, f"{i}.csv"), (mtime, mtime))
+    cat = PatternCatalog(
+        name="cat", urlpath=str(Path(folder_with_csvs, "{num}.csv")), driver="csv"
+    )
+
+    assert len(cat.query()) == 11
+    assert cat.query(min_size=5) == [{"num": "10"}]
+    assert cat.query(modified_since=cutoff) == [{"num": "10"}, {"num": "5"}]
+    assert cat.query(modified_since=datetime.fromtimestamp(cutoff), min_size=5) == [
+        {"num": "10"}
+    ]
+
+
+def test_reload_detects_rewritten_files(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(Path(folder_with_csvs, "{num}.csv")),
+        driver="csv",
+        ttl=-1,
+    )
+    entries = dict(cat._get_entries())
+    path = Path(folder_with_csvs, "1.csv")
+    path.write_text("a\n100")
+    os.utime(path, (path.stat().st_mtime + 10, path.stat().st_mtime + 10))
+
+    reloaded = cat._get_entries()
+    assert reloaded["num_0"] is entries["num_0"]
+    assert reloaded["num_1"] is not entries["num_1"]
+    assert cat.get_entry(num="1").read()["a"][0] == 100
+
+
+def test_file_info_unparseable_mtime():
+    info = file_info({"size": 3, "LastModified": "Fri, 10 Mar 2023 00:00:00 GMT"})
+    assert info == {"size": 3, "mtime": None, "etag": None}
+    assert file_info({"mtime": "2023-03-10T00:00:00Z"})["mtime"] == 1678406400.0
+
+
+def test_reload_size_only_filesystem():
+    fs = fsspec.filesystem("memory")
+    fs.pipe({"/size-only/1.csv": b"a\n1", "/size-only/2.csv": b"a\n2"})
+    try:
+        cat = PatternCatalog(
+            name="cat", urlpath="memory://size-only/{num}.csv", driver="csv", ttl=-1
+        )
+        entry = cat._get_entries()["num_1"]
+        assert entry.describe()["metadata"]["file_info"]["mtime"] is None
+        # Same size, so only the contents show that it was rewritten
+        fs.pipe("/size-only/1.csv", b"a\n5")
+        assert cat._get_entries()["num_1"] is not entry
+        assert cat.get_entry(num="1").read()["a"][0] == 5
+    finally:
+        fs.rm("/size-only", recursive=True)
+
+
+def test_index(folder_with_csvs: str, tmp_path: Path, glob_calls: List[str]):
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    index = str(tmp_path / "index.json")
+    cat = PatternCatalog(name="cat", urlpath=urlpath, driver="csv", listable=False)
+    cat.write_index(index)
+    assert len(glob_calls) == 1
+
+    listing_registry.clear()
+    indexed = PatternCatalog(name="cat", urlpath=urlpath, driver="csv", index=index)
+    assert len(glob_calls) == 1
+    assert len(indexed.get_entry_kwarg_sets()) == 10
+    assert indexed.get_entry(num="3").read()["a"][0] == 3
+    assert indexed.get_entry(num="3").metadata["file_info"]["size"] == 3
+
+
+def test_index_for_other_pattern(folder_with_csvs: str, tmp_path: Path):
+    index = str(tmp_path / "index.json")
+    PatternCatalog(
+        name="cat", urlpath=str(Path(folder_with_csvs, "{num}.csv")), driver="csv"
+    ).write_index(index)
+    with pytest.warns(UserWarning, match="Ignoring index"):
+        cat = PatternCatalog(
+            name="cat", urlpath="tests/data/{num}.csv", driver="csv", index=index
+        )
+    assert len(cat.get_entry_kwarg_sets()) == 3
+
+
+def test_index_missing(folder_with_csvs: str, tmp_path: Path):
+    with pytest.warns(UserWarning, match="Ignoring index .* doesn't exist"):
+        cat = PatternCatalog(
+            name="cat",
+            urlpath=str(Path(folder_with_csvs, "{num}.csv")),
+            driver="csv",
+            index=str(tmp_path / "index.json"),
+        )
+    assert len(cat.get_entry_kwarg_sets()) == 10
+
+
+def test_index_storage_options(folder_with_csvs: str, tmp_path: Path, monkeypatch):
+    opened = []
+    fsspec_open = fsspec.open
+
+    def recording_open(path, mode="rb", **kwargs):
+        opened.append((mode, kwargs))
+        return fsspec_open(path, mode, **kwargs)
+
+    monkeypatch.setattr(fsspec, "open", recording_open)
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    index = str(tmp_path / "index.json")
+    storage_options = {"auto_mkdir": True}
+    PatternCatalog(
+        name="cat", urlpath=urlpath, driver="csv", storage_options=storage_options
+    ).write_index(index)
+    indexed = PatternCatalog(
+        name="cat",
+        urlpath=urlpath,
+        driver="csv",
+        index=index,
+        storage_options=storage_options,
+    )
+    assert len(indexed.get_entry_kwarg_sets()) == 10
+    assert [(mode, kwargs.get("auto_mkdir")) for mode, kwargs in opened] == [
+        ("w", True),
+        ("r", True),
+    ]
+
+
+def test_index_cli(tmp_path: Path, capsys):
+    main(["index", "tests/test.yaml", "--output-dir", str(tmp_path)])
+    assert "folder_with_csvs: 3 matches in" in capsys.readouterr().out
+
+    cat = PatternCatalog(
+        name="cat",
+        urlpath="tests/data/{num}.csv",
+        driver="csv",
+        index=str(tmp_path / "folder_with_csvs.index.json"),
+    )
+    assert len(cat.get_entry_kwarg_sets()) == 3
+
+
+def test_index_cli_not_pattern_cat(tmp_path: Path):
+    with pytest.raises(SystemExit):
+        main(["index", "tests/test.yaml", "folder_with_csvs_transformed"])
+
+
+@pytest.fixture
+def dated_folders(tmp_path: Path) -> Path:
+    for folder in ["20230101", "20230102", "notes", "20230102/extra"]:
+        (tmp_path / folder).mkdir()
+    for path in [
+        "20230101/a.csv",
+        "20230102/b.csv",
+        "20230102/extra/c.csv",
+        "notes/d.csv",
+        "top.csv",
+    ]:
+        (tmp_path / path).write_text("a\n1")
+    return tmp_path
+
+
+@pytest.fixture
+def listed_dirs(monkeypatch) -> List[str]:
+    calls: List[str] = []
+    original = LocalFileSystem.ls
+
+    def recording_ls(self, path, detail=False, **kwargs):
+        calls.append(path)
+        return original(self, path, detail=detail, **kwargs)
+
+    monkeypatch.setattr(LocalFileSystem, "ls", recording_ls)
+    return calls
+
+
+def test_field_patterns(dated_folders: Path, listed_dirs: List[str]):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(dated_folders / "{date}" / "{name}.csv"),
+        driver="csv",
+        field_patterns={"date": "[0-9]{8}"},
+    )
+    assert cat.get_entry_kwarg_sets() == [
+        {"date": "20230101", "name": "a"},
+        {"date": "20230102", "name": "b"},
+    ]
+    # Folders not matching the date pattern are never listed
+    assert not any(path.endswith("notes") for path in listed_dirs)
+
+
+def test_field_patterns_recursive_field(dated_folders: Path, listed_dirs: List[str]):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(dated_folders / "{date}" / "{path}.csv"),
+        driver="csv",
+        field_patterns={"date": "[0-9]{8}", "path": ".+"},
+    )
+    assert cat._glob_path.endswith("/*/**.csv")
+    assert cat.get_entry_kwarg_sets() == [
+        {"date": "20230101", "path": "a"},
+        {"date": "20230102", "path": "b"},
+        {"date": "20230102", "path": "extra/c"},
+    ]
+    assert not any(path.endswith("notes") for path in listed_dirs)
+
+
+def test_field_patterns_s3(recursive_s3: str):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=recursive_s3,
+        driver="csv",
+        field_patterns={"path": "[a-z/]+[0-9]"},
+    )
+    assert cat.get_entry_kwarg_sets() == [
+        {"path": "nested/path/1"},
+        {"path": "nested/path/2"},
+    ]
+
+
+def test_field_patterns_unlistable(dated_folders: Path):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(dated_folders / "{date}" / "{name}.csv"),
+        driver="csv",
+        listable=False,
+        field_patterns={"date": "[0-9]{8}"},
+    )
+    assert cat.get_entry(date="20230101", name="a")
+    with pytest.raises(KeyError, match="doesn't match"):
+        cat.get_entry(date="notes", name="d")
+
+
+def test_async_entries(folder_with_csvs: str):
+    Path(folder_with_csvs, "10.csv").write_text("a\n10\n20\n30")
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(Path(folder_with_csvs, "{num}.csv")),
+        driver="csv",
+        ttl=-1,
+    )
+
+    async def run():
+        await cat.aload()
+        entry = await cat.aget_entry(num="3")
+        entries = await cat.aget_entries(min_size=5)
+        listed = [kwargs async for kwargs, _ in cat.aiter_entries()]
+        return entry, entries, listed
+
+    entry, entries, listed = asyncio.run(run())
+    assert entry.read()["a"][0] == 3
+    assert len(entries) == 1
+    assert entries[0].read()["a"].tolist() == [10, 20, 30]
+    assert len(listed) == 11
+
+
+def test_async_entries_after_ttl(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(Path(folder_with_csvs, "{num}.csv")),
+        driver="csv",
+        ttl=0.5,
+    )
+    Path(folder_with_csvs, "10.csv").write_text("a\n10")
+    sleep(0.6)
+
+    async def run():
+        entries = await cat.aget_entries([{"num": "0"}, {"num": "10"}])
+        Path(folder_with_csvs, "11.csv").write_text("a\n11")
+        sleep(0.6)
+        # Separate calls racing each other all see the reloaded entries
+        entries += await asyncio.gather(
+            cat.aget_entry(num="1"), cat.aget_entry(num="11")
+        )
+        return entries
+
+    entries = asyncio.run(run())
+    assert [e.read()["a"][0] for e in entries] == [0, 10, 1, 11]
+
+
+def test_async_s3(example_bucket, s3):
+    s3.put_object(Body="a\n1", Bucket=example_bucket, Key="1.csv")
+    s3.put_object(Body="a\n2", Bucket=example_bucket, Key="2.csv")
+    cat = PatternCatalog(
+        name="cat",
+        urlpath="s3://" + example_bucket + "/{num}.csv",
+        driver="csv",
+        ttl=-1,
+    )
+    s3.put_object(Body="a\n3", Bucket=example_bucket, Key="3.csv")
+
+    async def run():
+        entries = await cat.aget_entries([{"num": "1"}, {"num": "3"}])
+        return entries, await cat._aget_fs()
+
+    entries, fs = asyncio.run(run())
+    assert fs.asynchronous
+    assert [e.urlpath for e in entries] == [
+        "s3://" + example_bucket + "/1.csv",
+        "s3://" + example_bucket + "/3.csv",
+    ]
+    assert len(cat._kwarg_sets) == 3
+
+
+def test_async_filesystem(example_bucket, s3):
+    s3.put_object(Body="a\n1", Bucket=example_bucket, Key="1.csv")
+    fs = S3FileSystem(default_block_size=2**20)
+    cat = PatternCatalog(
+        name="cat", urlpath="s3://" + example_bucket + "/{num}.csv", driver="csv", fs=fs
+    )
+
+    async def run(close: bool):
+        async_fs = await cat._aget_fs()
+        assert len(await cat.aget_entries()) == 1
+        if close:
+            await cat.aclose()
+        return async_fs
+
+    async_fs = asyncio.run(run(close=False))
+    # Made like the filesystem the catalog was given, but running on the loop
+    assert type(async_fs) is S3FileSystem and async_fs is not fs
+    assert async_fs.asynchronous
+    assert async_fs.default_block_size == 2**20
+    # The session of a loop that has finished is closed when the next loop starts
+    ((_, _, finalizer),) = cat._async_filesystems.values()
+    assert finalizer.alive
+    asyncio.run(run(close=True))
+    assert not finalizer.alive
+    assert cat._async_filesystems == {}
+
+
+def test_async_unlistable(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat",
+        urlpath=str(Path(folder_with_csvs, "{num}.csv")),
+        driver="csv",
+        listable=False,
+    )
+    assert asyncio.run(cat.aget_entry(num="1"))
+    with pytest.raises(KeyError):
+        asyncio.run(cat.aget_entry(num="-1"))
+    assert len(list(cat)) == 1
+
+
+def test_async_filesystem_created_once(example_bucket, s3, monkeypatch):
+    sessions = []
+    set_session = S3FileSystem.set_session
+
+    async def counting_set_session(self, *args, **kwargs):
+        sessions.append(self)
+        # Connecting takes a while against a real endpoint
+        await asyncio.sleep(0.01)
+        return await set_session(self, *args, **kwargs)
+
+    monkeypatch.setattr(S3FileSystem, "set_session", counting_set_session)
+    for i in range(4):
+        s3.put_object(Body=f"a\n{i}", Bucket=example_bucket, Key=f"{i}.csv")
+    cat = PatternCatalog(
+        name="cat",
+        urlpath="s3://" + example_bucket + "/{num}.csv",
+        driver="csv",
+        listable=False,
+    )
+
+    async def run():
+        entries = await cat.aget_entries([{"num": str(i)} for i in range(4)])
+        await cat.aclose()
+        return entries
+
+    assert len(asyncio.run(run())) == 4
+    # s3fs calls set_session before every request, so count distinct instances
+    assert len({id(fs) for fs in sessions if fs.asynchronous}) == 1
+    assert cat._async_filesystems == {}
+
+
+def test_async_single_flight(folder_with_csvs: str, monkeypatch):
+    calls: List[str] = []
+    original = PatternCatalog._alist_paths
+
+    async def counting_alist_paths(self):
+        calls.append(self._glob_path)
+        await asyncio.sleep(0.1)
+        return await original(self)
+
+    monkeypatch.setattr(PatternCatalog, "_alist_paths", counting_alist_paths)
+    urlpath = str(Path(folder_with_csvs, "{num}.csv"))
+    cats = [
+        PatternCatalog(name=f"cat{i}", urlpath=urlpath, driver="csv", ttl=-1)
+        for i in range(8)
+    ]
+
+    async def run():
+        await asyncio.gather(*(cat.aload() for cat in cats))
+
+    asyncio.run(run())
+    assert len(calls) == 1
+    assert all(len(cat._kwarg_sets) == 10 for cat in cats)
+
+
+def test_async_not_blocked_by_sync_listing(folder_with_csvs: str):
+    key = ("listing", folder_with_csvs)
+    started, finish = Event(), Event()
+
+    def slow_loader():
+        started.set()
+        finish.wait(5)
+        return {}
+
+    async def aloader():
+        return {"a.csv": {}}
+
+    with ThreadPoolExecutor(1) as pool:
+        listing = pool.submit(listing_registry.get, key, slow_loader, -1)
+        started.wait(5)
+        start = perf_counter()
+        # The thread holds the key's lock while listing, which aget mustn't wait on
+        snapshot = asyncio.run(listing_registry.aget(key, aloader, -1))
+        elapsed = perf_counter() - start
+        finish.set()
+        listing.result()
+    assert snapshot.paths == ["a.csv"]
+    assert elapsed < 1
+
+
+def test_iter_entries_prefetch(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat", urlpath=str(Path(folder_with_csvs, "{num}.csv")), driver="csv"
+    )
+    entries = cat.iter_entries(prefetch=3)
+    values = []
+    for kwargs, entry in entries:
+        cache_dir = entries.cache_dir
+        assert entry.urlpath == cat.get_entry_path(**kwargs)
+        assert entry.metadata["file_info"]["size"] == 3
+        values.append(entry.read()["a"][0])
+        # Give the next entries time to download
+        sleep(0.05)
+    assert values == list(range(10))
+    assert entries.hits + entries.misses == 10
+    assert entries.hits > 0
+    assert entries.bytes_prefetched == 30
+    assert not Path(cache_dir).exists()
+
+
+def test_iter_entries_max_bytes(folder_with_csvs: str, tmp_path: Path):
+    cat = PatternCatalog(
+        name="cat", urlpath=str(Path(folder_with_csvs, "{num}.csv")), driver="csv"
+    )
+    cache_dir = tmp_path / "cache"
+    entries = cat.iter_entries(prefetch=5, max_bytes=6, cache_dir=str(cache_dir))
+    for _, entry in entries:
+        sleep(0.05)
+        assert len(list(cache_dir.iterdir())) <= 2
+        entry.read()
+    assert entries.bytes_prefetched == 30
+    assert list(cache_dir.iterdir()) == []
+
+
+def test_iter_entries_evicted_entry_still_readable(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat", urlpath=str(Path(folder_with_csvs, "{num}.csv")), driver="csv"
+    )
+    entries = cat.iter_entries([{"num": "1"}, {"num": "2"}], prefetch=1)
+    cache_dirs = []
+    yielded = []
+    for _, entry in entries:
+        cache_dirs.append(entries.cache_dir)
+        yielded.append(entry)
+    # Evicted entries read the original files rather than downloading them again
+    assert [entry.read()["a"][0] for entry in yielded] == [1, 2]
+    assert not any(Path(d).exists() for d in cache_dirs)
+
+
+def test_iter_entries_reiterate(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="cat", urlpath=str(Path(folder_with_csvs, "{num}.csv")), driver="csv"
+    )
+    entries = cat.iter_entries(prefetch=2)
+    # Nothing is set up until iterating
+    assert entries.cache_dir is None
+    entries.close()
+    for _ in range(2):
+        assert [entry.read()["a"][0] for _, entry in entries] == list(range(10))
+    assert entries.bytes_prefetched == 60
+    assert entries.cache_dir is None
+
+
+def test_iter_entries_s3(example_bucket, s3):
+    for i in range(3):
+        s3.put_object(Body=f"a\n{i}", Bucket=example_bucket, Key=f"{i}.csv")
+    cat = PatternCatalog(
+        name="cat", urlpath="s3://" + example_bucket + "/{num}.csv", driver="csv"
+    )
+    with cat.iter_entries(prefetch=2) as entries:
+        assert [entry.read()["a"][0] for _, entry in entries] == [0, 1, 2]
+    assert entries.bytes_prefetched == 9
+
+
+def test_derived_dataset_iter_entries(folder_with_csvs: str):
+    cat = PatternCatalog(
+        name="catalog_to_transform",
+        urlpath=str(Path(folder_with_csvs, "{num}.csv")),
+        driver="csv",
+    )
+    derived_cat = PatternCatalogTransform(
+        targets=[cat],
+        transform=double_transform,
+        target_kwargs=None,
+        transform_kwargs=None,
+        metadata=None,
+    )
+    values = [
+        entry.read()["a"][0]
+        for _, entry in derived_cat.iter_entries([{"num": "1"}, {"num": "2"}])
+    ]
+    assert values == [2, 4]